@@ -1,18 +1,179 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
 import sys
+import queue
+import hashlib
+import threading
 import tkinter as tk
 from tkinter import ttk
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 
 # 导入图像处理库 Pillow
 try:
     from PIL import Image, ImageTk
     HAS_PIL = True
+    # EPUB 常来自第三方，保留解压炸弹检查，仅把上限放宽到 1.28 亿像素（默认约 0.89 亿）：
+    # 超过上限仅警告，超过两倍（约 2.7 亿像素，RGBA 解码后约 1 GB）时 Image.open 抛出异常，
+    # 该图在网格中显示为加载失败。draft() 只对 JPEG 有效，其他格式会按原尺寸解码，
+    # 最多 DECODE_WORKERS 张同时进行，上限不能取消。
+    Image.MAX_IMAGE_PIXELS = 128 * 1024 * 1024
+    # 缩略图用 BILINEAR 重采样（Pillow 9.1+ 移到 Image.Resampling）
+    _RESAMPLE = getattr(Image, 'Resampling', Image).BILINEAR
 except ImportError:
     HAS_PIL = False
 
+# 缩略图磁盘缓存：按图像内容哈希命名，重复运行时无需再次解码
+THUMB_CACHE_DIR = os.path.expanduser('~/.sigil_thumb_cache')
+try:
+    from PIL import features
+    _CACHE_FORMAT, _CACHE_EXT = ('WEBP', '.webp') if features.check('webp') else ('PNG', '.png')
+except Exception:
+    _CACHE_FORMAT, _CACHE_EXT = 'PNG', '.png'
+
+# 网格布局：每个单元格为 160x180（缩略图 + 文件名），单元格之间留 10 像素间距
+COLS = 4
+THUMB_SIZE = (160, 160)
+CELL_W, CELL_H = 160, 180
+PAD = 10
+ROW_H = CELL_H + 2 * PAD
+
+# 只解码视口附近的缩略图：视口上下各保留 2 屏，超出范围的缩略图会被释放
+KEEP_VIEWPORTS = 2
+
+# 后台解码线程数（Pillow 解码/缩放时会释放 GIL）；主线程轮询解码结果的间隔（毫秒）
+DECODE_WORKERS = min(4, os.cpu_count() or 1)
+POLL_MS = 30
+
+def _grid_region(n):
+    """n 个单元格组成的网格所占区域，直接作为 canvas 的 scrollregion"""
+    rows = (n + COLS - 1) // COLS
+    return (0, 0, COLS * (CELL_W + 2 * PAD), rows * ROW_H)
+
+def _cell_origin(i):
+    """返回第 i 个单元格左上角在 canvas 上的坐标"""
+    x = PAD + (i % COLS) * (CELL_W + 2 * PAD)
+    y = PAD + (i // COLS) * (CELL_H + 2 * PAD)
+    return x, y
+
+def _content_key(data):
+    """图像内容哈希（BLAKE2b-128），用于清单内去重和磁盘缓存命名"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _cache_path(key):
+    """按内容哈希和缩略图尺寸生成磁盘缓存路径"""
+    return os.path.join(THUMB_CACHE_DIR, u"{0}_{1}x{2}{3}".format(key, THUMB_SIZE[0], THUMB_SIZE[1], _CACHE_EXT))
+
+def _save_cache(img, path):
+    """写入磁盘缓存；失败（如目录只读）时静默跳过"""
+    try:
+        os.makedirs(THUMB_CACHE_DIR, exist_ok=True)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+        # 先写临时文件再替换，避免多个线程同时写同一缓存时读到半个文件
+        tmp = u"{0}.{1}.tmp".format(path, threading.get_ident())
+        img.save(tmp, _CACHE_FORMAT, quality=80)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+def _open_img(data):
+    """打开并立即完整解码图像，之后 Image 不再引用 BytesIO，缓冲区可随即释放"""
+    bio = BytesIO(data)
+    img = Image.open(bio)
+    if img.format == 'JPEG':
+        # 让 libjpeg 在解码时直接按 DCT 缩小（1/2~1/8），避免全尺寸解码；
+        # draft 必须在 load() 之前调用，且不要在 thumbnail 前 copy()，否则 draft 失效
+        img.draft('RGB', THUMB_SIZE)
+    img.load()
+    return img
+
+def _make_thumb(data, cache_path=None):
+    """解码图像并缩放为缩略图；给出 cache_path 时优先读取、并写回磁盘缓存"""
+    if cache_path and os.path.exists(cache_path):
+        try:
+            img = Image.open(cache_path)
+            img.load()
+            return img
+        except Exception:
+            # 缓存损坏时重新生成
+            pass
+
+    img = _open_img(data)
+    img.thumbnail(THUMB_SIZE, _RESAMPLE)
+    if cache_path:
+        _save_cache(img, cache_path)
+    return img
+
+def _draw_placeholder(canvas, i, img_href):
+    """绘制单元格占位：边框与文件名，缩略图在滚动到视口附近时才加载"""
+    x, y = _cell_origin(i)
+    canvas.create_rectangle(x, y, x + CELL_W, y + CELL_H, outline="#A0A0A0")
+
+    # 提取并显示文件名（不含路径）
+    filename = img_href.split('/')[-1]   # 假设使用 '/' 分隔
+    short_name = filename if len(filename) < 18 else filename[:15] + "..."
+    canvas.create_text(x + CELL_W // 2, y + CELL_H - 4, text=short_name, font=("Arial", 8), anchor="s")
+
+def _draw_thumb(canvas, i, photo):
+    """在占位单元格中绘制缩略图，返回 canvas 条目 id"""
+    x, y = _cell_origin(i)
+    return canvas.create_image(x + CELL_W // 2, y + THUMB_SIZE[1] // 2, image=photo, anchor="center")
+
+def _draw_error(canvas, i, img_href):
+    """在 canvas 上绘制红色警告块（显示文件名）"""
+    x, y = _cell_origin(i)
+    canvas.create_rectangle(x, y, x + CELL_W, y + CELL_H, outline="black", fill="#FFE4E1")
+    canvas.create_text(x + CELL_W // 2, y + 10, text="读取失败", fill="red",
+                       font=("Arial", 9, "bold"), anchor="n")
+
+    # 显示文件名（提取后）
+    display_name = img_href.split('/')[-1] if '/' in img_href else img_href
+    canvas.create_text(x + CELL_W // 2, y + 40, text=display_name, font=("Arial", 7),
+                       width=140, anchor="n", justify="center")
+
+    canvas.create_text(x + CELL_W // 2, y + CELL_H - 5, text="清单中不存在或路径无效",
+                       fill="#555", font=("Arial", 7), anchor="s")
+
+def _bind_wheel(canvas):
+    """
+    绑定鼠标滚轮。缩略图都是 canvas 条目，直接绑定在 canvas 上即可（无需 bind_all）；
+    滚轮事件只累加原始 delta，同一轮空闲前的多次滚动合并为一次 yview_scroll；
+    不足 120（一格）的部分留到下次，高精度触控板的小 delta 累计后同样能滚动。
+    """
+    scroll = canvas.yview_scroll
+    wheel = [0, None]   # [累计 delta, after_idle 任务]
+
+    def _flush():
+        # 向零取整换算为步数，余数保留
+        steps = int(-wheel[0] / 120.0)
+        wheel[0] += steps * 120
+        wheel[1] = None
+        if steps:
+            scroll(steps, "units")
+
+    def _queue(delta):
+        wheel[0] += delta
+        if wheel[1] is None:
+            wheel[1] = canvas.after_idle(_flush)
+
+    def _on_mousewheel(event):
+        # 针对 Windows 的 delta 逻辑
+        _queue(event.delta)
+
+    # 针对 Linux 的滚轮
+    def _on_button4(event):
+        _queue(120)
+
+    def _on_button5(event):
+        _queue(-120)
+
+    canvas.bind("<MouseWheel>", _on_mousewheel)
+    canvas.bind("<Button-4>", _on_button4)
+    canvas.bind("<Button-5>", _on_button5)
+
 def run(bc):
     # 初始化主窗口
     root = tk.Tk()
@@ -22,21 +183,10 @@ def run(bc):
     # 创建 Canvas 和 滚动条
     canvas = tk.Canvas(root, highlightthickness=0)
     v_scrollbar = ttk.Scrollbar(root, orient="vertical", command=canvas.yview)
-    scroll_frame = ttk.Frame(canvas)
 
-    # 鼠标滚轮支持函数
-    def _on_mousewheel(event):
-        # 针对 Windows 的 delta 逻辑
-        canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+    # 鼠标滚轮支持
+    _bind_wheel(canvas)
 
-    # 绑定滚轮（bind_all 确保在图片上方也能滚动）
-    canvas.bind_all("<MouseWheel>", _on_mousewheel)
-    # 针对 Linux 的滚轮绑定
-    canvas.bind_all("<Button-4>", lambda e: canvas.yview_scroll(-1, "units"))
-    canvas.bind_all("<Button-5>", lambda e: canvas.yview_scroll(1, "units"))
-
-    scroll_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-    canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
     canvas.configure(yscrollcommand=v_scrollbar.set)
 
     # --- 资源获取与调试核心 ---
@@ -51,51 +201,145 @@ def run(bc):
     except Exception as e:
         print(u"无法获取图片列表: {0}".format(e))
 
+    # 缩略图直接画在 canvas 上
     if not HAS_PIL:
-        tk.Label(scroll_frame, text="错误: 未安装 Pillow 库", fg="red").pack(pady=20)
+        canvas.create_text(PAD, 2 * PAD, text="错误: 未安装 Pillow 库", fill="red", anchor="nw")
     elif not img_list:
-        tk.Label(scroll_frame, text="未发现图像资源").pack(pady=20)
+        canvas.create_text(PAD, 2 * PAD, text="未发现图像资源", anchor="nw")
     else:
-        cols = 4
+        photos = {}        # 内容哈希 -> PhotoImage：相同内容的图像只解码一次，同时保持引用避免被回收
+        cell_keys = {}     # 单元格下标 -> 内容哈希
+        thumb_items = {}   # 单元格下标 -> canvas 图像条目 id
+        failed = set()     # 读取失败的单元格下标，不再重试
+        loading = {}       # 单元格下标 -> 正在等待解码结果的内容哈希
+        pending = {}       # 内容哈希 -> 正在后台解码的 Future
+
+        # Tk 只能在主线程中使用：工作线程只做 Pillow 解码，结果经队列交回主线程
+        pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS)
+        done = queue.Queue()
+        poll_job = [None]
+
+        # 启动时只绘制占位，不解码任何图像
         for i, (img_id, img_href) in enumerate(img_list):
+            _draw_placeholder(canvas, i, img_href)
+
+        def _mark_failed(i):
+            # --- 调试方案：捕获并定位错误资源 ---
+            img_id, img_href = img_list[i]
+            failed.add(i)
+            error_info = u"ID: {0}, Href: {1}".format(img_id, img_href)
+            print(u"【疑似重复图片资源项】 " + error_info)
+
+            # 在 GUI 界面绘制红色警告块
+            _draw_error(canvas, i, img_href)
+
+        def _load_thumb(i):
+            img_id = img_list[i][0]
+            data = None
+            try:
+                key = cell_keys.get(i)
+                if key is None:
+                    # 尝试读取二进制数据（仍使用ID读取）；bc 不是线程安全的，只在主线程读取
+                    data = bc.readfile(img_id)
+                    key = cell_keys[i] = _content_key(data)
+
+                # 先查内存中已解码的相同内容，再查正在解码的任务，最后才提交新的解码
+                photo = photos.get(key)
+                if photo is not None:
+                    thumb_items[i] = _draw_thumb(canvas, i, photo)
+                    return
+                loading[i] = key
+                if key in pending:
+                    return
+                if data is None:
+                    data = bc.readfile(img_id)
+            except Exception:
+                loading.pop(i, None)
+                _mark_failed(i)
+                return
+
+            future = pool.submit(_make_thumb, data, _cache_path(key))
+            pending[key] = future
+            future.add_done_callback(lambda f, key=key: done.put((key, f)))
+            if poll_job[0] is None:
+                poll_job[0] = root.after(POLL_MS, _poll_done)
+
+        def _install(key, future):
+            # 已被取消的结果直接丢弃
+            if pending.get(key) is not future:
+                return
+            del pending[key]
+            cells = [i for i, k in loading.items() if k == key]
+            for i in cells:
+                del loading[i]
+            if not cells:
+                return
             try:
-                # 尝试读取二进制数据（仍使用ID读取）
-                data = bc.readfile(img_id)
+                photo = ImageTk.PhotoImage(future.result())
+            except Exception:
+                for i in cells:
+                    _mark_failed(i)
+                return
+            photos[key] = photo
+            for i in cells:
+                thumb_items[i] = _draw_thumb(canvas, i, photo)
 
-                img = Image.open(BytesIO(data))
-                img.thumbnail((160, 160))
-                photo = ImageTk.PhotoImage(img)
+        def _poll_done():
+            poll_job[0] = None
+            while True:
+                try:
+                    key, future = done.get_nowait()
+                except queue.Empty:
+                    break
+                _install(key, future)
+            if pending:
+                poll_job[0] = root.after(POLL_MS, _poll_done)
 
-                # 正常显示容器
-                f = tk.Frame(scroll_frame, bd=1, relief="sunken")
-                f.grid(row=i // cols, column=i % cols, padx=10, pady=10)
+        def _refresh_visible():
+            # 根据当前视口计算可见行，加载进入视口的缩略图
+            top = canvas.canvasy(0)
+            height = max(canvas.winfo_height(), 1)
+            first = max(int(top // ROW_H), 0)
+            last = int((top + height) // ROW_H)
+            margin = KEEP_VIEWPORTS * (height // ROW_H + 1)
+            lo, hi = (first - margin) * COLS, (last + margin + 1) * COLS
 
-                lbl_img = tk.Label(f, image=photo)
-                lbl_img.image = photo
-                lbl_img.pack()
+            for i in range(first * COLS, min((last + 1) * COLS, len(img_list))):
+                if i not in thumb_items and i not in failed and i not in loading:
+                    _load_thumb(i)
 
-                # 提取并显示文件名（不含路径）
-                filename = img_href.split('/')[-1]   # 假设使用 '/' 分隔
-                short_name = filename if len(filename) < 18 else filename[:15] + "..."
-                tk.Label(f, text=short_name, font=("Arial", 8)).pack()
+            # 释放离视口过远的缩略图，并取消不再需要的解码任务，限制内存占用
+            for i in [i for i in thumb_items if not lo <= i < hi]:
+                canvas.delete(thumb_items.pop(i))
+            for i in [i for i in loading if not lo <= i < hi]:
+                del loading[i]
+            wanted = set(loading.values())
+            for key in [k for k in pending if k not in wanted]:
+                pending.pop(key).cancel()
+            shown = set(cell_keys[i] for i in thumb_items)
+            for key in [k for k in photos if k not in shown]:
+                del photos[key]
 
-            except Exception as e:
-                # --- 调试方案：捕获并定位错误资源 ---
-                error_info = u"ID: {0}, Href: {1}".format(img_id, img_href)
-                print(u"【疑似重复图片资源项】 " + error_info)
+        # 滚动与窗口尺寸变化只标记“需要刷新”，同一轮空闲前的多次触发合并为一次刷新
+        refresh_job = [None]
 
-                # 在 GUI 界面绘制红色警告块（显示文件名）
-                f_err = tk.Frame(scroll_frame, bd=1, relief="solid", bg="#FFE4E1", width=160, height=180)
-                f_err.grid(row=i // cols, column=i % cols, padx=10, pady=10)
-                f_err.grid_propagate(False)  # 固定大小
+        def _do_refresh():
+            refresh_job[0] = None
+            _refresh_visible()
 
-                tk.Label(f_err, text="读取失败", fg="red", bg="#FFE4E1", font=("Arial", 9, "bold")).pack(pady=10)
+        def _schedule_refresh(event=None):
+            if refresh_job[0] is None:
+                refresh_job[0] = canvas.after_idle(_do_refresh)
 
-                # 显示文件名（提取后）
-                display_name = img_href.split('/')[-1] if '/' in img_href else img_href
-                tk.Label(f_err, text=display_name, bg="#FFE4E1", font=("Arial", 7), wraplength=140).pack()
+        def _on_yscroll(first, last):
+            v_scrollbar.set(first, last)
+            _schedule_refresh()
 
-                tk.Label(f_err, text="清单中不存在或路径无效", bg="#FFE4E1", font=("Arial", 7), fg="#555").pack(side="bottom", pady=5)
+        canvas.configure(yscrollcommand=_on_yscroll)
+        canvas.bind("<Configure>", _schedule_refresh)
+
+        # 滚动区域由网格尺寸直接算出，无需用 bbox("all") 遍历全部条目
+        canvas.configure(scrollregion=_grid_region(len(img_list)))
 
     v_scrollbar.pack(side="right", fill="y")
     canvas.pack(side="left", fill="both", expand=True)
@@ -104,5 +348,11 @@ def run(bc):
     root.focus_force()
     root.mainloop()
 
+    # 窗口关闭后取消剩余的解码任务
+    if HAS_PIL and img_list:
+        for future in pending.values():
+            future.cancel()
+        pool.shutdown(wait=False)
+
     print("--- 扫描结束 ---")
     return 0
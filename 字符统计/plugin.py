@@ -9,16 +9,31 @@ EPUB 字数统计插件（兼容旧版 Sigil）
 - 改造：新增所有字符、CJK 字符（按区块）、数字、字母、其他字符的详细统计和去重统计。
 """
 
+import os
 import re
 import sys
+import bisect
 # import ctypes # 暂时不需要弹窗
-from collections import defaultdict
+from collections import defaultdict, Counter
 
-# HTMLParser 兼容 (py2/py3)
+# 多进程并行（py2 无 concurrent.futures，退回串行）
 try:
-    from html.parser import HTMLParser
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+# NumPy 可选：存在时用向量化方式做字符分类（Sigil 内置 Python 不一定带 numpy）
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# HTML 实体解码兼容 (py2/py3)
+try:
+    from html import unescape as _unescape
 except ImportError:
     from HTMLParser import HTMLParser
+    _unescape = HTMLParser().unescape
 
 # BeautifulSoup from sigil_bs4 (Sigil 内置适配)
 try:
@@ -30,6 +45,13 @@ except Exception:
     except Exception:
         BeautifulSoup = None
 
+# BeautifulSoup 解析器：优先用 lxml（C 实现，Sigil 内置），否则退回 html.parser
+try:
+    import lxml  # noqa: F401
+    _BS_PARSER = 'lxml'
+except Exception:
+    _BS_PARSER = 'html.parser'
+
 # 完整的 CJK 扩展区定义（使用用户提供的完整列表）
 CJK_EXTENSIONS = [
     {'name': '基本区', 'ranges': [(0x4E00, 0x9FFF)]},
@@ -50,45 +72,113 @@ CJK_EXTENSIONS = [
     {'name': '扩展J', 'ranges': [(0x323B0, 0x33479)]},
 ]
 
+def _flatten_cjk_ranges(parts):
+    """
+    把各分区的区间展开为按起点排序、互不重叠的 (起点, 终点, 名称) 列表，供二分查找使用。
+    用户自定义的区间可能与已有区间重叠：重叠部分归列表中靠前的分区（与按顺序逐个匹配的结果一致）。
+    """
+    segs = []
+    for part in parts:
+        for (start, end) in part['ranges']:
+            # 减去已被靠前分区占用的部分，只保留剩余的空隙
+            pieces = [(start, end)] if start <= end else []
+            for (s, e, _) in segs:
+                rest = []
+                for (a, b) in pieces:
+                    if e < a or s > b:
+                        rest.append((a, b))
+                        continue
+                    if a < s:
+                        rest.append((a, s - 1))
+                    if b > e:
+                        rest.append((e + 1, b))
+                pieces = rest
+            segs.extend((a, b, part['name']) for (a, b) in pieces)
+    segs.sort()
+    return segs
+
+_CJK_RANGES = _flatten_cjk_ranges(CJK_EXTENSIONS)
+_STARTS = [r[0] for r in _CJK_RANGES]
+_ENDS = [r[1] for r in _CJK_RANGES]
+_NAMES = [r[2] for r in _CJK_RANGES]
+
+# 字符类别编号：空白、数字、字母、其他
+_CLASS_SPACE, _CLASS_DIGIT, _CLASS_ALPHA, _CLASS_OTHER = range(4)
+
+def _char_class(chstr):
+    """返回单个字符的类别编号（判断顺序同统计规则：空白 > 数字 > 字母 > 其他）"""
+    if chstr.isspace():
+        return _CLASS_SPACE
+    if chstr.isdigit():
+        return _CLASS_DIGIT
+    if chstr.isalpha():
+        return _CLASS_ALPHA
+    return _CLASS_OTHER
+
+# NumPy 分类用的区间数组及 ASCII 类别表（一次查表代替三次 isXXX 判断）
+if np is not None:
+    _STARTS_ARR = np.array(_STARTS, dtype=np.uint32)
+    _ENDS_ARR = np.array(_ENDS, dtype=np.uint32)
+    _ASCII_CLASS = np.array([_char_class(chr(c)) for c in range(128)], dtype=np.uint8)
+
+# 空白字符（与 str.isspace 一致）
+_WS_RE = re.compile(r'\s', re.U)
+
+# 英文单词与标点：模块加载时预编译/预构建一次
+_WORD_RE = re.compile(r'[A-Za-z]+')
+_HALFWIDTH_PUNCT = u'!"#$%&\'()*+,-./:;<=>?@[]\\^_`{|}~'
+_FULLWIDTH_PUNCT = u'！？｡。＂＃＄％＆＇（）＊＋，－／：；＜＝＞＠［＼］＾＿｀｛｜｝～、《》〈〉「」『』【】〔〕—…￥'
+# 标点集合：在按去重字符分类的同一趟循环中统计，不再单独扫描全文
+_HALFWIDTH_SET = frozenset(_HALFWIDTH_PUNCT)
+_FULLWIDTH_SET = frozenset(_FULLWIDTH_PUNCT)
+if np is not None:
+    # 半角标点均 < 128，全角标点均 >= 128，向量化路径据此区分
+    _PUNCT_ARR = np.array(sorted(ord(c) for c in _HALFWIDTH_SET | _FULLWIDTH_SET), dtype=np.uint32)
+
+# py2/py3 兼容的 chr 与 unicode 类型
+try:
+    _unichr = unichr  # type: ignore
+    _text_type = unicode  # type: ignore
+except NameError:
+    _unichr = chr
+    _text_type = str
+
 # 要统计的 HTML 标签列表
 TAGS_TO_COUNT = ['b', 'i', 'u', "img", "table","ruby"]
 
-# --- 原始辅助函数（MLStripper, strip_tags, iter_chars）保持不变 ---
+# 所有文件的总字符数低于该值时不启用多进程（进程启动开销大于收益）。
+# 实测（Linux 上以 spawn 方式启动，即 Windows/macOS 的默认方式）：每个子进程启动并导入 numpy/bs4/lxml
+# 约 0.2 秒，串行统计约 200 万字符/秒；两个进程时串行耗时需超过约 2 倍启动开销（约 90 万字符）才划算，
+# 再为数据传输开销及 Windows 上通常更慢的进程启动留出余量，取 200 万字符。
+PARALLEL_MIN_CHARS = 2000000
 
-# HTML -> 文本：使用 HTMLParser 提取文本节点
-class MLStripper(HTMLParser):
-    def __init__(self):
-        # 兼容 py2/py3 的基类初始化方式
-        try:
-            HTMLParser.__init__(self)
-        except Exception:
-            super(MLStripper, self).__init__()
-        self.reset()
-        self.strict = False
-        # py3 的 HTMLParser 有 convert_charrefs 参数，但 py2 没有也没关系
-        try:
-            self.convert_charrefs = True
-        except Exception:
-            pass
-        self.text_parts = []
+# 每个子进程一次领取的文件数
+PARALLEL_CHUNKSIZE = 4
 
-    def handle_data(self, d):
-        self.text_parts.append(d)
+# --- 原始辅助函数（strip_tags, iter_chars） ---
 
-    def get_data(self):
-        return ''.join(self.text_parts)
+# HTML -> 文本：正则去掉标签后解码实体，扫描全程在 C 层的正则引擎中完成
+# 与 HTMLParser 一致，只有 < 后紧跟字母、/、!、? 时才视为标签，正文里的 "1<2" 之类保持不变
+_TAG_RE = re.compile(r'<[A-Za-z/!?][^>]*>')
 
 def strip_tags(html):
-    s = MLStripper()
-    try:
-        s.feed(html)
-    except Exception:
-        # 有时 feed 在旧版会出问题，兜底直接返回原始文本
-        pass
-    return s.get_data()
+    text = _TAG_RE.sub('', html)
+    if '&' in text:
+        text = _unescape(text)
+    return text
+
+# 不需要 soup 时的快速文本提取：只整体去掉注释与 script/style 块（与 soup.get_text() 一致，不计入其内容），
+# 去标签和实体解码留给 count_text 中的 strip_tags，保证只做一次
+_SKIP_RE = re.compile(r'<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>', re.I | re.S)
+
+def _fast_get_text(html):
+    return _SKIP_RE.sub('', html)
+
+# 是否为宽字符构建：Python 3.3+ 恒为 True，此时每个下标就是一个完整码点
+_WIDE = sys.maxunicode > 0xFFFF
 
 # 迭代文本字符（处理 UTF-16 surrogate pair，确保跨 BMP 的码点被当作一个字符处理）
-def iter_chars(text):
+def _iter_chars_narrow(text):
     """
     遍历字符串，按“用户可见字符”切分：
     - 在 narrow build（如某些 Python2/Windows 环境）中，BMP 以外的字符以 surrogate pair 两个 code units 表示，
@@ -112,107 +202,79 @@ def iter_chars(text):
         yield cp, ch
         i += 1
 
+def _iter_chars_wide(text):
+    """宽字符构建中不存在 surrogate pair，直接逐字符返回 (codepoint, char)"""
+    return ((ord(c), c) for c in text)
+
+iter_chars = _iter_chars_wide if _WIDE else _iter_chars_narrow
+
+def classify_cjk(cp):
+    """二分查找 codepoint 所属的 CJK 扩展区名称，不属于任何分区则返回 None"""
+    i = bisect.bisect_right(_STARTS, cp) - 1
+    if i >= 0 and cp <= _ENDS[i]:
+        return _NAMES[i]
+    return None
+
 def is_cjk_codepoint(cp):
     """判断 codepoint 是否属于任何一个 CJK 扩展区"""
-    for part in CJK_EXTENSIONS:
-        for (start, end) in part['ranges']:
-            if start <= cp <= end:
-                return True
-    return False
+    return classify_cjk(cp) is not None
 
 def which_cjk_extension(cp):
-    """返回第一个匹配的扩展区名称，找不到则返回 None"""
-    for part in CJK_EXTENSIONS:
-        for (start, end) in part['ranges']:
-            if start <= cp <= end:
-                return part['name']
-    return None
+    """返回匹配的扩展区名称，找不到则返回 None"""
+    return classify_cjk(cp)
 
-# --- 改造后的统计函数 ---
-def count_text(html_content):
-    # 先去掉 HTML 标签
-    text = strip_tags(html_content)
-
-    # 兼容 py2/py3 的 unicode 判断：确保 text 是 unicode 类型
-    try:
-        unicode  # type: ignore
-    except NameError:
-        # py3
-        _unicode_type = str
+def _count_chars_counter(text):
+    """
+    无 numpy 时的兜底路径：
+    - 先用正则一次性去掉空白，再交给 Counter 在 C 层完成逐字符计数；
+    - 分类只针对去重后的字符进行，复杂度为 O(去重字符数)。
+    """
+    # { (codepoint, char_str): count }
+    if _WIDE:
+        char_counts = Counter(_WS_RE.sub(u'', text))
+        all_char_counts = Counter(dict(((ord(c), c), n) for c, n in char_counts.items()))
     else:
-        _unicode_type = unicode  # type ignore
-
-    if not isinstance(text, _unicode_type):
-        try:
-            text = text.decode('utf-8')
-        except Exception:
-            try:
-                text = _unicode_type(text)
-            except Exception:
-                # 兜底：替换非 utf-8 字节
-                try:
-                    text = text.decode('utf-8', 'ignore')
-                except Exception:
-                    text = unicode(text, errors='ignore') if _unicode_type is not str else str(text)
+        # narrow build：仍用 iter_chars 把 surrogate pair 当作一个字符
+        all_char_counts = Counter(key for key in iter_chars(text) if not key[1].isspace())
 
-
-    # 字典用于存储统计结果
-    # { (codepoint, char_str): count }
-    all_char_counts = defaultdict(int)
     # { 'Extension Name': { (codepoint, char_str): count } }
-    cjk_char_counts_by_ext = defaultdict(lambda: defaultdict(int))
+    cjk_char_counts_by_ext = defaultdict(Counter)
 
     # 按类别分组的字符（非空白）
-    digits_chars = defaultdict(int)
-    letters_chars = defaultdict(int)
-    other_chars = defaultdict(int)
+    digits_chars = Counter()
+    letters_chars = Counter()
+    other_chars = Counter()
 
-    # 原始的统计项（可选保留，但本改造主要关注新需求）
-    total_chars = 0
     total_cjk = 0
-    
-    # 使用迭代器保证 surrogate pair 被当作一个字符
-    for cp, chstr in iter_chars(text):
-        # 排除空白
-        if chstr.isspace():
-            continue
+    halfwidth_punct = 0
+    fullwidth_punct = 0
+    for key, count in all_char_counts.items():
+        cp, chstr = key
+        # 半角/全角标点
+        if chstr in _HALFWIDTH_SET:
+            halfwidth_punct += count
+        elif chstr in _FULLWIDTH_SET:
+            fullwidth_punct += count
+
+        # CJK 字符分类统计（一次查找同时得到是否 CJK 及所属分区）
+        ext = classify_cjk(cp)
+        if ext:
+            total_cjk += count
+            cjk_char_counts_by_ext[ext][key] = count
+        # 数字、字母、其他字符分类统计 (非 CJK 且 非空白)
+        elif chstr.isdigit():
+            digits_chars[key] = count
+        elif chstr.isalpha():
+            letters_chars[key] = count
+        else:
+            # 不属于 CJK, 数字, 字母, 空白 的都归入 '其他'
+            other_chars[key] = count
 
-        # 1. 总字符统计（非空白）
-        total_chars += 1
-        all_char_counts[(cp, chstr)] += 1
-        
-        # 2. CJK 字符分类统计
-        is_cjk = False
-        if is_cjk_codepoint(cp):
-            total_cjk += 1
-            ext = which_cjk_extension(cp)
-            if ext:
-                cjk_char_counts_by_ext[ext][(cp, chstr)] += 1
-                is_cjk = True
-        
-        # 3. 数字、字母、其他字符分类统计 (非 CJK 且 非空白)
-        if not is_cjk:
-            if chstr.isdigit():
-                digits_chars[(cp, chstr)] += 1
-            elif chstr.isalpha():
-                letters_chars[(cp, chstr)] += 1
-            else:
-                # 不属于 CJK, 数字, 字母, 空白 的都归入 '其他'
-                other_chars[(cp, chstr)] += 1
-
-    # 原始统计（仅保留总数，其他详细统计已通过 all_char_counts 实现）
-    english_words = len(re.findall(r'[A-Za-z]+', text))
-    halfwidth_punct = len(re.findall(r'[!"#$%&\'()*+,\-./:;<=>?@\[\]\\\^_`{|}~]', text))
-    fullwidth_punct = len(re.findall(u'[！？｡。＂＃＄％＆＇（）＊＋，－／：；＜＝＞＠［＼］＾＿｀｛｜｝～、《》〈〉「」『』【】〔〕——……￥]', text))
-    
     return {
-        'total_chars': total_chars,
-        'english_words': english_words,
+        'total_chars': sum(all_char_counts.values()),
+        'total_cjk': total_cjk,
         'halfwidth_punct': halfwidth_punct,
         'fullwidth_punct': fullwidth_punct,
-        'total_cjk': total_cjk,
-        
-        # 新增统计结果
         'all_char_counts': all_char_counts,
         'cjk_char_counts_by_ext': cjk_char_counts_by_ext,
         'digits_chars': digits_chars,
@@ -220,38 +282,118 @@ def count_text(html_content):
         'other_chars': other_chars,
     }
 
+def _count_chars_numpy(text):
+    """
+    NumPy 向量化统计：
+    - 先把文本转为 UTF-32 码点数组，用 np.unique 一次性完成去重计数；
+    - 再对去重后的码点用布尔掩码划分空白、CJK（按分区）、数字、字母、其他；
+    - ASCII 部分查 _ASCII_CLASS 类别表，非 ASCII 的少量剩余字符才回退到 _char_class。
+    """
+    cps = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    uniq, counts = np.unique(cps, return_counts=True)
+
+    # CJK 分区：对排序后的区间起点做向量化二分查找（ext_idx 为 _NAMES 下标）
+    ext_idx = np.searchsorted(_STARTS_ARR, uniq, side='right') - 1
+    cjk_mask = (ext_idx >= 0) & (uniq <= _ENDS_ARR[np.maximum(ext_idx, 0)])
+
+    # 字符类别：ASCII 查表，非 ASCII 的去重字符逐个判断
+    classes = np.full(len(uniq), _CLASS_OTHER, dtype=np.uint8)
+    ascii_mask = uniq < 128
+    classes[ascii_mask] = _ASCII_CLASS[uniq[ascii_mask]]
+    for i in np.flatnonzero(~ascii_mask).tolist():
+        classes[i] = _char_class(_unichr(int(uniq[i])))
+
+    # 排除空白
+    keep = classes != _CLASS_SPACE
+    uniq, counts, classes = uniq[keep], counts[keep], classes[keep]
+    ext_idx, cjk_mask = ext_idx[keep], cjk_mask[keep]
+
+    digit_mask = ~cjk_mask & (classes == _CLASS_DIGIT)
+    alpha_mask = ~cjk_mask & (classes == _CLASS_ALPHA)
+    other_mask = ~cjk_mask & (classes == _CLASS_OTHER)
+    punct_mask = np.isin(uniq, _PUNCT_ARR)
+
+    # 最后一次性构造字典
+    cps_list = uniq.tolist()
+    counts_list = counts.tolist()
+    keys = [(cp, _unichr(cp)) for cp in cps_list]
+
+    def _select(mask):
+        return Counter(dict((keys[i], counts_list[i]) for i in np.flatnonzero(mask).tolist()))
+
+    cjk_char_counts_by_ext = defaultdict(Counter)
+    ext_list = ext_idx.tolist()
+    for i in np.flatnonzero(cjk_mask).tolist():
+        cjk_char_counts_by_ext[_NAMES[ext_list[i]]][keys[i]] = counts_list[i]
+
+    return {
+        'total_chars': int(counts.sum()),
+        'total_cjk': int(counts[cjk_mask].sum()),
+        'halfwidth_punct': int(counts[punct_mask & (uniq < 128)].sum()),
+        'fullwidth_punct': int(counts[punct_mask & (uniq >= 128)].sum()),
+        'all_char_counts': Counter(dict(zip(keys, counts_list))),
+        'cjk_char_counts_by_ext': cjk_char_counts_by_ext,
+        'digits_chars': _select(digit_mask),
+        'letters_chars': _select(alpha_mask),
+        'other_chars': _select(other_mask),
+    }
+
+# --- 改造后的统计函数 ---
+def count_text(html_content):
+    # 调用方负责解码（见 run()），这里只接受 unicode 文本
+    assert isinstance(html_content, _text_type)
+
+    # 先去掉 HTML 标签
+    text = strip_tags(html_content)
+
+    # 逐字符分类统计：有 numpy 且为宽字符构建时走向量化路径
+    if np is not None and _WIDE:
+        res = _count_chars_numpy(text)
+    else:
+        res = _count_chars_counter(text)
+
+    # 原始统计：英文单词数（标点已在按字符分类时一并统计）
+    res['english_words'] = len(_WORD_RE.findall(text))
+    return res
+
 # 统计 HTML 标签函数
-def count_html_tags(html_content):
-    """统计指定 HTML 标签的出现次数"""
+def count_html_tags_from_soup(soup):
+    """在已解析好的 soup 上统计指定 HTML 标签的出现次数"""
     tag_counts = {tag: 0 for tag in TAGS_TO_COUNT}
-    
-    if not BeautifulSoup:
+
+    if soup is None:
         return tag_counts
-    
+
     try:
-        # 使用 'html.parser' 兼容性更好
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
         for tag in TAGS_TO_COUNT:
             tag_counts[tag] = len(soup.find_all(tag))
-            
     except Exception:
-        # 如果解析失败，返回空统计
+        # 如果统计失败，返回空统计
         pass
-    
+
     return tag_counts
 
+def count_html_tags(html_content):
+    """统计指定 HTML 标签的出现次数"""
+    if not BeautifulSoup:
+        return count_html_tags_from_soup(None)
+
+    try:
+        soup = BeautifulSoup(html_content, _BS_PARSER)
+    except Exception:
+        # 如果解析失败，返回空统计
+        soup = None
+
+    return count_html_tags_from_soup(soup)
+
 # --- 改造后的输出函数 ---
 def format_char_counts(title, char_counts):
     """格式化输出字符统计列表"""
     lines = []
     
     # 按照出现次数降序，然后按 Unicode 码点升序排序
-    # char_counts 是 {(cp, chstr): count} 的字典
-    sorted_chars = sorted(
-        char_counts.items(), 
-        key=lambda item: (-item[1], item[0][0])
-    )
+    # char_counts 是 {(cp, chstr): count} 的字典；排序 (-count, cp, chstr) 元组，无需 key 函数
+    sorted_chars = sorted((-count, cp, chstr) for (cp, chstr), count in char_counts.items())
     
     total_count = sum(char_counts.values())
     unique_count = len(char_counts)
@@ -260,23 +402,72 @@ def format_char_counts(title, char_counts):
     lines.append(u"总字符数：{0}, 去重字符数：{1}".format(total_count, unique_count))
     if unique_count > 0:
         lines.append(u"序号,Unicode,字符,出现次数")
-        for i, ((cp, chstr), count) in enumerate(sorted_chars):
-            # 格式化 Unicode：U+000000
-            unicode_str = u"U+{0:04X}".format(cp)
-            lines.append(u"{0},{1},{2},{3}".format(i+1, unicode_str, chstr, count))
+        # 整块明细用一次 join 生成；Unicode 列格式化为 U+XXXX
+        lines.append(u"\n".join(
+            u"%d,U+%04X,%s,%d" % (i, cp, chstr, -neg_count)
+            for i, (neg_count, cp, chstr) in enumerate(sorted_chars, 1)
+        ))
     
     return lines
 
+# 单个文件的统计（可在子进程中运行，只依赖传入的数据）
+def _process_one(name, data):
+    """统计单个 HTML 文件，返回 (name, 标签统计, 字符统计)"""
+    # 只有需要统计标签时才用 BeautifulSoup 解析；解析过的 soup 同时用于文本提取
+    soup = None
+    if BeautifulSoup and TAGS_TO_COUNT:
+        try:
+            soup = BeautifulSoup(data, _BS_PARSER)
+        except Exception:
+            soup = None
+
+    # 统计 HTML 标签
+    file_tag_counts = count_html_tags_from_soup(soup)
+
+    # 提取文本进行字符统计
+    if soup is not None:
+        # 尝试用 get_text() 获取纯文本
+        html_for_count = soup.get_text() if hasattr(soup, 'get_text') else str(soup)
+    else:
+        # 无 soup 时用正则快速去掉注释与 script/style，其余标签由 count_text 去除
+        html_for_count = _fast_get_text(data)
+
+    return name, file_tag_counts, count_text(html_for_count)
+
+def _process_all(items):
+    """
+    统计所有 (name, data)，结果顺序与 items 一致。
+    各文件互不依赖，数据量足够大且有多核时用 ProcessPoolExecutor 并行，否则串行。
+    """
+    # 进程数不超过 CPU 数，也不超过文件块数，避免启动领不到文件的子进程
+    workers = 1
+    if ProcessPoolExecutor:
+        workers = min(os.cpu_count() or 1, (len(items) + PARALLEL_CHUNKSIZE - 1) // PARALLEL_CHUNKSIZE)
+        if sys.platform == 'win32':
+            # Windows 上 ProcessPoolExecutor 最多支持 61 个进程
+            workers = min(workers, 61)
+    if workers > 1 and sum(len(data) for _, data in items) >= PARALLEL_MIN_CHARS:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                return list(ex.map(_process_one,
+                                   [name for name, _ in items],
+                                   [data for _, data in items],
+                                   chunksize=PARALLEL_CHUNKSIZE))
+        except Exception:
+            # 子进程不可用（如被宿主环境限制）时退回串行
+            pass
+    return [_process_one(name, data) for name, data in items]
+
 # Sigil 插件入口
 def run(container):
     # 汇总所有文件统计
     total_chars = 0
     total_cjk = 0
-    all_char_counts = defaultdict(int)
-    cjk_char_counts_by_ext = defaultdict(lambda: defaultdict(int))
-    digits_chars = defaultdict(int)
-    letters_chars = defaultdict(int)
-    other_chars = defaultdict(int)
+    all_char_counts = Counter()
+    cjk_char_counts_by_ext = defaultdict(Counter)
+    digits_chars = Counter()
+    letters_chars = Counter()
+    other_chars = Counter()
 
     # 原始统计（可选保留）
     english_words = 0
@@ -287,32 +478,24 @@ def run(container):
     total_tag_counts = {tag: 0 for tag in TAGS_TO_COUNT}
     file_tag_stats = []
 
-    # 遍历 EPUB 文档
+    # 遍历 EPUB 文档：先在主进程读出全部内容（container 不能跨进程使用）
+    items = []
     for name, href in container.text_iter():
         try:
             data = container.readfile(name)
         except Exception:
             continue
 
-        # 统计 HTML 标签
-        file_tag_counts = count_html_tags(data)
+        # 只在这里解码一次，之后的解析与统计都使用 unicode 文本
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', 'replace')
+        items.append((name, data))
+
+    for name, file_tag_counts, res in _process_all(items):
         file_tag_stats.append((name, file_tag_counts))
         for tag, count in file_tag_counts.items():
             total_tag_counts[tag] += count
 
-        # 提取文本进行字符统计
-        if BeautifulSoup:
-            try:
-                soup = BeautifulSoup(data, 'html.parser')
-                # 尝试用 get_text() 获取纯文本
-                html_for_count = soup.get_text() if hasattr(soup, 'get_text') else str(soup)
-            except Exception:
-                html_for_count = data
-        else:
-            html_for_count = data
-
-        res = count_text(html_for_count)
-        
         # 汇总字符统计
         total_chars += res['total_chars']
         total_cjk += res['total_cjk']
@@ -320,17 +503,13 @@ def run(container):
         halfwidth_punct += res['halfwidth_punct']
         fullwidth_punct += res['fullwidth_punct']
 
-        for cp_chstr, count in res['all_char_counts'].items():
-            all_char_counts[cp_chstr] += count
+        # Counter.update 在 C 层完成合并
+        all_char_counts.update(res['all_char_counts'])
         for ext, counts in res['cjk_char_counts_by_ext'].items():
-            for cp_chstr, count in counts.items():
-                cjk_char_counts_by_ext[ext][cp_chstr] += count
-        for cp_chstr, count in res['digits_chars'].items():
-            digits_chars[cp_chstr] += count
-        for cp_chstr, count in res['letters_chars'].items():
-            letters_chars[cp_chstr] += count
-        for cp_chstr, count in res['other_chars'].items():
-            other_chars[cp_chstr] += count
+            cjk_char_counts_by_ext[ext].update(counts)
+        digits_chars.update(res['digits_chars'])
+        letters_chars.update(res['letters_chars'])
+        other_chars.update(res['other_chars'])
 
 
     # 构造输出文本（unicode）